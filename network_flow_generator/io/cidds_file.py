@@ -1,11 +1,30 @@
-import fileinput
+import io
 import ipaddress
+import os
+import zlib
 
 import numpy as np
 import pandas as pd
 
 from network_flow_generator.log import Logger
-from network_flow_generator.utils.pandas_utils import apply_parallel
+from network_flow_generator.utils.cidds_utils import ipv4_to_str
+from network_flow_generator.utils.numba_utils import scale_where
+from network_flow_generator.utils.pandas_utils import apply_parallel, map_unique
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as pa_feather
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+try:
+    import cudf
+    HAVE_CUDF = True
+except ImportError:
+    HAVE_CUDF = False
 
 log = Logger.get()
 
@@ -17,14 +36,14 @@ class CiddsFile:
         ("date_first_seen", "datetime64[ms]"),
         ("duration", "f4"),
         ("proto", "i1"),
-        ("src_ip_addr", "object"),
+        ("src_ip_addr", "u4"),
         ("src_pt", "u2"),
-        ("dst_ip_addr", "object"),
+        ("dst_ip_addr", "u4"),
         ("dst_pt", "u2"),
         ("packets", "u8"),
         ("bytes", "u8"),
         ("flows", "u1"),
-        ("flags", "?"),
+        ("flags", "u1"),
         ("tos", "u1"),
         ("class", "i1"),
         ("attack_type", "U8"),
@@ -46,6 +65,74 @@ class CiddsFile:
         "unknown": np.uint(5),
     }
 
+    _headers = [
+        "date_first_seen",
+        "duration",
+        "proto",
+        "src_ip_addr",
+        "src_pt",
+        "dst_ip_addr",
+        "dst_pt",
+        "packets",
+        "bytes",
+        "flows",
+        "flags",
+        "tos",
+        "class",
+        "attack_type",
+        "attack_id",
+        "attack_description",
+    ]
+
+    _initial_dtypes = {
+        "date_first_seen": "str",
+        "duration": "float32",
+        "proto": "str",
+        "src_pt": "uint16",
+        "src_ip_addr": "str",
+        "dst_ip_addr": "str",
+        "dst_pt": "float64",
+        "packets": "uint64",
+        "flows": "uint8",
+        "tos": "uint8",
+        "class": "category",
+        "attack_type": "category",
+        "attack_id": "str",
+        "attack_description": "str",
+    }
+
+    # size of the byte ranges that are parsed at a time on the GPU
+    _gpu_chunk_bytes = 1 << 28
+
+    _file_headers = [
+        "Date first seen",
+        "Duration",
+        "Proto",
+        "Src IP Addr",
+        "Src Pt",
+        "Dst IP Addr",
+        "Dst Pt",
+        "Packets",
+        "Bytes",
+        "Flows",
+        "Flags",
+        "Tos",
+        "class",
+        "attackType",
+        "attackID",
+        "attackDescription",
+    ]
+
+    _categorical_columns = ["proto", "class", "attack_type"]
+
+    # version of the converted data in the cache files, which must be increased whenever the conversion changes
+    _cache_version = b"1"
+
+    # flag strings of all possible bit masks, indexed by the bit mask
+    _flag_strings = np.array([
+        "".join(flag if mask & (1 << (5 - i)) else "." for i, flag in enumerate("UAPRSF")) for mask in range(64)
+    ])
+
     # random IPv4 addresses as replacements
     _ipv4_replacements = {
         "OPENSTACK_NET": "174.138.74.74",
@@ -56,9 +143,25 @@ class CiddsFile:
         "ATTACKER3": "201.95.169.48",
     }
 
-    def __init__(self, path):
+    def __init__(self, path, use_cache=True, use_gpu=False):
+        """
+        Args:
+            path (str): The path of the csv file.
+            use_cache (bool, optional): Cache the converted data in a feather file next to the csv file. Requires
+                pyarrow. Defaults to True.
+            use_gpu (bool, optional): Parse the csv file on the GPU. Requires cudf. Defaults to False.
+
+        Raises:
+            ImportError: If the GPU shall be used and cudf is not installed.
+        """
+        if use_gpu and not HAVE_CUDF:
+            raise ImportError("Parsing csv files on the GPU requires cudf")
+
         self._path = path
+        self._use_cache = use_cache
+        self._use_gpu = use_gpu
         self._file = None
+        self._schema = None
 
     def __enter__(self):
         return self
@@ -71,229 +174,563 @@ class CiddsFile:
         return self._path
 
     @classmethod
-    def _convert_ipv4_address(cls, value):
-        """Creates missing public ip addresses and converts them into ``IPv4Address`` datatypes.
+    def _convert_anonymized_ipv4_address(cls, value):
+        """Turns an anonymized ip address like ``"10004_35"`` into a pseudo-random public ip address.
 
         Args:
             value (str): The input value to convert.
 
         Returns:
-            IPv4Address: Converted ip4v address.
+            int: Converted ip4v address as integer.
         """
-        # value = value.decode("utf-8")
+        splitted_value = value.split("_")
+        while True:
+            # turn the random value into a pseudo-random ip address, crc32 is used instead of hash() because
+            # the result must not depend on PYTHONHASHSEED
+            random_value = zlib.crc32(splitted_value[0].encode())
+            ipv4_address = ipaddress.IPv4Address((random_value % 16777216) << 8) + int(splitted_value[1])
+            if ipv4_address.is_global:
+                return int(ipv4_address)
+            else:
+                splitted_value[0] += "0"
+
+    @classmethod
+    def _convert_ipv4_addresses(cls, series):
+        """Creates missing public ip addresses and converts ip addresses into ``uint32`` values. The columns contain
+            only a few distinct addresses, so this is applied on the distinct values with ``map_unique``.
+
+        Args:
+            series (pd.Series): The ip addresses to convert.
+
+        Returns:
+            np.ndarray: Converted ip4v addresses.
+        """
+        if series.isnull().any():
+            raise ValueError("Column '{}' contains missing ip addresses".format(series.name))
+        ipv4_addresses = np.empty(len(series), dtype=np.uint32)
+
         # anonymized ip addresses with special treatment
-        if value in cls._ipv4_replacements:
-            return ipaddress.IPv4Address(cls._ipv4_replacements[value])
+        replaced = series.isin(cls._ipv4_replacements).values
+        if replaced.any():
+            replacements = {k: int(ipaddress.IPv4Address(v)) for k, v in cls._ipv4_replacements.items()}
+            ipv4_addresses[replaced] = series[replaced].map(replacements).values
 
         # other anonymized addresses
-        if "_" in value:
-            splitted_value = value.split("_")
-            while True:
-                # turn the random value into a pseudo-random ip address
-                ipv4_address = ipaddress.IPv4Address((hash(splitted_value[0]) % 16777216) << 8) + int(splitted_value[1])
-                if ipv4_address.is_global:
-                    return ipv4_address
-                else:
-                    splitted_value[0] += "0"
+        anonymized = series.str.contains("_", regex=False).values & ~replaced
+        if anonymized.any():
+            ipv4_addresses[anonymized] = series[anonymized].map(cls._convert_anonymized_ipv4_address).values
 
         # regular ip addresses
-        return ipaddress.IPv4Address(value)
+        regular = ~(replaced | anonymized)
+        if regular.any():
+            octets = series[regular].str.split(".", expand=True).values.astype(np.uint32)
+            ipv4_addresses[regular] = (octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]
+
+        return ipv4_addresses
 
     @classmethod
-    def _convert_flags(cls, value):
-        """Converts a string of TCP flags into an tuple of booleans.
+    def _convert_flags(cls, series):
+        """Converts a column of TCP flag strings into bit masks.
 
         Args:
-            value (str): Input value to convert.
+            series (pd.Series): Column of flag strings like ``".AP.S."``.
 
         Returns:
-            tuple of bool: Tuple of active flags: URG, ACK, PSH, RST, SYN, FIN
+            np.ndarray: ``uint8`` bit masks of the active flags URG, ACK, PSH, RST, SYN, FIN, where URG is the
+                most significant bit.
         """
-        return (
-            value[0:1] == "U",
-            value[1:2] == "A",
-            value[2:3] == "P",
-            value[3:4] == "R",
-            value[4:5] == "S",
-            value[5:6] == "F",
-        )
+        flags = np.zeros(len(series), dtype=np.uint8)
+        for i, flag in enumerate("UAPRSF"):
+            flags |= (series.str.get(i) == flag).values.astype(np.uint8) << np.uint8(5 - i)
+        return flags
 
     @classmethod
-    def _convert_flags_reverse(cls, value):
-        """Converts a string of TCP flags into an tuple of booleans.
+    def _convert_flags_reverse(cls, flags):
+        """Converts TCP flag bit masks back into flag strings.
 
         Args:
-            value (str): Input value to convert.
+            flags (pd.Series): Column of ``uint8`` bit masks.
 
         Returns:
-            tuple of bool: Tuple of active flags: URG, ACK, PSH, RST, SYN, FIN
+            np.ndarray: Flag strings like ``".AP.S."``.
         """
+        return np.take(cls._flag_strings, np.asarray(flags, dtype=np.uint8) & 0x3F)
 
-        return "".join([
-            "U" if value[0] else ".",
-            "A" if value[1] else ".",
-            "P" if value[2] else ".",
-            "R" if value[3] else ".",
-            "S" if value[4] else ".",
-            "F" if value[5] else ".",
-        ])
+    @classmethod
+    def _parse_bytes(cls, series):
+        """Parses byte counts in a format like ``"108"`` or ``"1.0 M"``.
+
+        Args:
+            series (pd.Series): The byte counts as strings.
+
+        Returns:
+            np.ndarray: The parsed ``uint64`` values.
+        """
+        values = series.astype("str").str.strip()
+        # values with a format like "1.0 M"
+        suffixed = values.str.contains(" ", regex=False).values
+        numbers = pd.to_numeric(values.str.split(n=1).str[0]).values
+        return scale_where(numbers, suffixed, 1e6, np.uint64)
 
     @classmethod
-    def _convert_bytes(cls, value):
-        try:
-            return np.int64(value)
-        except ValueError:
-            # value has a format like "1.0 M"
-            return np.int64(np.float(value.split()[0]) * 1e6)
+    def _convert_bytes(cls, series):
+        """Converts a column of byte counts into integer numbers. Large byte counts are expressed in a
+            format like ``"1.0 M"``, which makes pandas read the whole column as strings.
+
+        Args:
+            series (pd.Series): The input column.
+
+        Returns:
+            np.ndarray: The parsed ``uint64`` values.
+        """
+        if series.dtype != object:
+            return series.values.astype(np.uint64)
+        return map_unique(series, cls._parse_bytes)
 
     @classmethod
-    def _convert_destination_port(cls, value):
-        """Convert destination port to integer number. The destination port values of ICMP requests
-            are expressed as float values so I need to take care of them somehow.
+    def _convert_destination_port(cls, series):
+        """Convert destination ports to integer numbers. The destination port values of ICMP requests
+            are expressed as float values like ``3.1`` (type and code), which are turned into ``31``.
 
         Args:
-            value (str): The input value
+            series (pd.Series): The input column
 
         Returns:
-            np.int64: The parsed value
+            np.ndarray: The parsed ``uint16`` values
         """
-        try:
-            return np.int64(value)
-        except ValueError:
-            return np.int64(np.float(value) * 10)
+        ports = np.asarray(series.values, dtype=np.float64)
+        is_icmp = ports != np.floor(ports)
+        return scale_where(ports, is_icmp, 10, np.uint16)
 
-    def _apply_converters(self, df):
-        # apply converters
-        df["proto"] = df["proto"].str.strip().astype("category")
-        df["src_ip_addr"] = df["src_ip_addr"].map(self._convert_ipv4_address)
-        df["dst_ip_addr"] = df["dst_ip_addr"].map(self._convert_ipv4_address)
-        df["dst_pt"] = df["dst_pt"].map(self._convert_destination_port).astype("uint16")
-        # bytes can be either an integer or number suffixed with "M"
-        df["bytes"] = df["bytes"].map(self._convert_bytes)
-        df["flags"] = df["flags"].map(self._convert_flags)
-        return df
+    @staticmethod
+    def _convert_dates(series):
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        # an explicit format is much faster than inferring it and repeated timestamps are parsed only once
+        return pd.to_datetime(series, format="%Y-%m-%d %H:%M:%S.%f", cache=True)
 
-    def _pandas_read_csv(self, chunksize=None, nrows=None):
-        headers = [
-            "date_first_seen",
-            "duration",
-            "proto",
-            "src_ip_addr",
-            "src_pt",
-            "dst_ip_addr",
-            "dst_pt",
-            "packets",
-            "bytes",
-            "flows",
-            "flags",
-            "tos",
-            "class",
-            "attack_type",
-            "attack_id",
-            "attack_description",
-        ]
-
-        _initial_dtypes = {
-            "duration": "float32",
-            "proto": "str",
-            "src_pt": "uint16",
-            "src_ip_addr": "str",
-            "dst_ip_addr": "str",
-            "dst_pt": "float64",
-            "packets": "uint64",
-            "flows": "uint8",
-            "tos": "uint8",
-            "class": "category",
-            "attack_type": "category",
-            "attack_id": "str",
-            "attack_description": "str",
+    def _apply_converters(self, df):
+        # the string columns contain only few distinct values, so they are converted once per distinct value
+        converters = {
+            "date_first_seen": self._convert_dates,
+            "proto": lambda series: pd.Categorical(map_unique(series, lambda v: v.str.strip())),
+            "src_ip_addr": lambda series: map_unique(series, self._convert_ipv4_addresses),
+            "dst_ip_addr": lambda series: map_unique(series, self._convert_ipv4_addresses),
+            "dst_pt": self._convert_destination_port,
+            # bytes can be either an integer or number suffixed with "M"
+            "bytes": self._convert_bytes,
+            "flags": lambda series: map_unique(series, self._convert_flags),
         }
+        # only the read columns are converted, if the file is read partially
+        for column, converter in converters.items():
+            if column in df.columns:
+                df[column] = converter(df[column])
+        return df
 
+    def _pandas_read_csv(self, chunksize=None, nrows=None, columns=None):
         return pd.read_csv(
             self._path,
             header=None,
             skiprows=1,
-            names=headers,
-            dtype=_initial_dtypes,
-            parse_dates=["date_first_seen"],
+            names=self._headers,
+            usecols=columns,
+            dtype=self._initial_dtypes,
             delimiter=",",
             error_bad_lines=False,
             chunksize=chunksize,
             nrows=nrows,
             low_memory=True)
 
-    def read(self, nrows=None):
-        log.debug("Read dataframe from of '%s'", self._path)
-        df = self._pandas_read_csv(chunksize=None, nrows=nrows)
+    def _arrow_read_csv(self, chunksize=None, nrows=None, columns=None):
+        """Reads the file with the multithreaded csv reader of pyarrow.
+
+        Args:
+            chunksize (int, optional): The number of rows per chunk. If None the whole file is read at once.
+                Defaults to None.
+            nrows (int, optional): The number of rows to read. Defaults to None.
+            columns (List[str], optional): The columns to read. Defaults to None, which reads all columns.
+
+        Returns:
+            pd.DataFrame or Iterator[pd.DataFrame]: The dataframe or a generator of chunks if a chunk size is given.
+        """
+        string = pa.string()
+        category = pa.dictionary(pa.int32(), pa.string())
+        read_options = pa_csv.ReadOptions(block_size=1 << 24, column_names=self._headers, skip_rows=1)
+        parse_options = pa_csv.ParseOptions(delimiter=",", invalid_row_handler=lambda row: "skip")
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=columns,
+            column_types={
+                "date_first_seen": pa.timestamp("ms"),
+                "duration": pa.float32(),
+                "proto": string,
+                "src_ip_addr": string,
+                "src_pt": pa.uint16(),
+                "dst_ip_addr": string,
+                "dst_pt": pa.float64(),
+                "packets": pa.uint64(),
+                # the type must not be inferred per block as large values are suffixed with "M"
+                "bytes": string,
+                "flows": pa.uint8(),
+                "flags": string,
+                "tos": pa.uint8(),
+                "class": category,
+                "attack_type": category,
+                "attack_id": string,
+                "attack_description": string,
+            })
+
+        if chunksize is None and nrows is None:
+            table = pa_csv.read_csv(self._path, read_options, parse_options, convert_options)
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+
+        reader = pa_csv.open_csv(self._path, read_options, parse_options, convert_options)
+        if chunksize is None:
+            # stream the file, so the parsing stops after the requested rows
+            tables = list(self._rechunk_batches(reader, max(1, nrows), nrows))
+            table = tables[0] if tables else reader.schema.empty_table()
+            return table.to_pandas(split_blocks=True, self_destruct=True)
+
+        return (table.to_pandas(split_blocks=True) for table in self._rechunk_batches(reader, chunksize, nrows))
+
+    @staticmethod
+    def _rechunk_batches(batches, chunksize, nrows=None):
+        """Regroups arrow record batches into tables with a fixed number of rows.
+
+        Args:
+            batches (Iterator[pa.RecordBatch]): The record batches.
+            chunksize (int): The number of rows per table.
+            nrows (int, optional): The number of rows to read. Defaults to None.
+
+        Yields:
+            pa.Table: The regrouped tables.
+        """
+        buffer = []
+        buffered = 0
+        remaining = nrows
+        for batch in batches:
+            if remaining is not None:
+                batch = batch.slice(0, remaining)
+                remaining -= batch.num_rows
+            buffer.append(batch)
+            buffered += batch.num_rows
+
+            while buffered >= chunksize:
+                table = pa.Table.from_batches(buffer)
+                buffer = table.slice(chunksize).to_batches()
+                buffered -= chunksize
+                yield table.slice(0, chunksize)
+
+            if remaining == 0:
+                break
+
+        if buffered > 0:
+            yield pa.Table.from_batches(buffer)
+
+    def _cudf_read_csv(self, chunksize=None, nrows=None, columns=None):
+        """Reads the file on the GPU with cudf. The parsed data is moved to the host as pandas dataframes, on which the
+            converters are applied.
 
+        Args:
+            chunksize (int, optional): The number of rows per chunk. If None the whole file is read at once.
+                Defaults to None.
+            nrows (int, optional): The number of rows to read. Defaults to None.
+            columns (List[str], optional): The columns to read. Defaults to None, which reads all columns.
+
+        Returns:
+            pd.DataFrame or Iterator[pd.DataFrame]: The dataframe or a generator of chunks if a chunk size is given.
+        """
+        if chunksize is None:
+            return self._cudf_read_range(header=0, nrows=nrows, usecols=columns).to_pandas()
+
+        return (table.to_pandas(split_blocks=True) for table in self._rechunk_batches(
+            self._cudf_read_batches(columns), chunksize, nrows))
+
+    def _cudf_read_range(self, header, **kwargs):
+        dtypes = dict(self._initial_dtypes, date_first_seen="datetime64[ms]", bytes="str", flags="str")
+        return cudf.read_csv(self._path, header=header, names=self._headers, dtype=dtypes, delimiter=",", **kwargs)
+
+    def _cudf_read_batches(self, columns=None):
+        # cudf parses the rows that start within a byte range, so the file can be read in windows without running
+        # out of GPU memory
+        filesize = os.path.getsize(self._path)
+        for start in range(0, filesize, self._gpu_chunk_bytes):
+            df = self._cudf_read_range(header=0 if start == 0 else None,
+                                       byte_range=(start, self._gpu_chunk_bytes),
+                                       usecols=columns)
+            yield from df.to_arrow().to_batches()
+
+    def _read_csv(self, chunksize=None, nrows=None, columns=None):
+        if self._use_gpu:
+            return self._cudf_read_csv(chunksize=chunksize, nrows=nrows, columns=columns)
+        if HAVE_PYARROW:
+            return self._arrow_read_csv(chunksize=chunksize, nrows=nrows, columns=columns)
+        return self._pandas_read_csv(chunksize=chunksize, nrows=nrows, columns=columns)
+
+    @property
+    def cache_path(self):
+        return self._path + ".feather"
+
+    def _has_valid_cache(self):
+        """Checks if there is a cache file of the converted data, which is newer than the csv file and was written
+            with the current cache version.
+
+        Returns:
+            bool: True if the cache can be used.
+        """
+        if not (self._use_cache and HAVE_PYARROW and os.path.isfile(self.cache_path) and
+                os.path.getmtime(self.cache_path) >= os.path.getmtime(self._path)):
+            return False
+        try:
+            with pa.memory_map(self.cache_path) as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return False
+        return metadata.get(b"cidds_cache_version") == self._cache_version
+
+    def _table_to_cache(self, df, schema=None):
+        """Converts a dataframe into an arrow table that can be stored in the cache file. Categorical columns are
+            stored as plain strings, since the categories of the chunks may differ.
+
+        Args:
+            df (pd.DataFrame): The converted dataframe.
+            schema (pa.Schema, optional): The schema of the cache file. Defaults to None.
+
+        Returns:
+            pa.Table: The arrow table.
+        """
+        df = df.astype({column: "str" for column in self._categorical_columns})
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b"cidds_cache_version"] = self._cache_version
+        return table.replace_schema_metadata(metadata)
+
+    def _table_from_cache(self, table):
+        df = table.to_pandas(split_blocks=True)
+        return df.astype({column: "category" for column in self._categorical_columns if column in df.columns})
+
+    def _convert(self, df):
         # apply data converters in parallel if the dataframe is big enough
-        if df.shape[0] >= 25000:
-            df = apply_parallel(df, self._apply_converters)
-        else:
-            df = self._apply_converters(df)
+        return apply_parallel(df, self._apply_converters, min_partition_size=25000)
+
+    def read(self, nrows=None):
+        if self._has_valid_cache():
+            log.debug("Read dataframe from cache '%s'", self.cache_path)
+            table = pa_feather.read_table(self.cache_path)
+            if nrows is not None:
+                table = table.slice(0, nrows)
+            return self._table_from_cache(table)
+
+        log.debug("Read dataframe from of '%s'", self._path)
+        df = self._convert(self._read_csv(chunksize=None, nrows=nrows))
+
+        if self._use_cache and HAVE_PYARROW and nrows is None:
+            log.debug("Write dataframe to cache '%s'", self.cache_path)
+            tmp_path = self.cache_path + ".tmp"
+            try:
+                pa_feather.write_feather(self._table_to_cache(df), tmp_path, compression="lz4")
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                # e.g. a read-only data set directory, the data is still returned
+                log.warning("Failed to write cache '%s': %s", self.cache_path, str(e))
+                self._remove_file(tmp_path)
 
         return df
 
-    def read_chunks(self, chunksize=500000, nrows=None):
-        assert chunksize and chunksize > 0
+    def _pick_chunksize(self):
+        """Estimates the number of rows in about 256 MB of csv data from the mean row length of the first megabyte.
+            Benchmarks of chunked csv parsing (dask-cudf) show an optimum near 256 MB chunks, smaller chunks add
+            overhead per chunk and larger ones only increase the memory usage.
+
+        Returns:
+            int: The number of rows per chunk.
+        """
+        with open(self._path, "rb") as f:
+            sample = f.read(1 << 20)
+        num_rows = max(1, sample.count(b"\n"))
+        return max(50000, (256 << 20) * num_rows // max(1, len(sample)))
+
+    def read_chunks(self, chunksize=None, nrows=None, columns=None):
+        """Reads the converted file in chunks from the cache or, if there is no valid cache, from the csv file. The
+            converted chunks of the csv file are written to the cache, if the whole file is read.
 
+        Args:
+            chunksize (int, optional): The number of rows per chunk. Defaults to None, which picks about 256 MB of csv
+                data per chunk.
+            nrows (int, optional): The number of rows to read. Defaults to None.
+            columns (List[str], optional): The columns to read. Only these columns are parsed and converted, e.g. to
+                compute statistics of a few columns without converting the whole file. Defaults to None, which reads
+                all columns.
+
+        Yields:
+            pd.DataFrame: The converted chunks.
+        """
+        chunksize = chunksize or self._pick_chunksize()
+        assert chunksize > 0
+
+        if self._has_valid_cache():
+            log.debug("Read chunks from cache '%s'", self.cache_path)
+            with pa.memory_map(self.cache_path) as source:
+                reader = pa.ipc.open_file(source)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+                for table in self._rechunk_batches(batches, chunksize, nrows):
+                    if columns is not None:
+                        table = table.select(columns)
+                    yield self._table_from_cache(table)
+            return
+
+        writer = None
+        schema = None
+        tmp_path = self.cache_path + ".tmp"
         chunk_number = 0
-        chunks = self._pandas_read_csv(chunksize=chunksize, nrows=nrows)
+        chunks = self._read_csv(chunksize=chunksize, nrows=nrows, columns=columns)
+        # write the converted chunks to the cache, unless only a part of the file is read
+        write_cache = self._use_cache and HAVE_PYARROW and nrows is None and columns is None
 
         try:
             while True:
                 log.debug("Read chunk %d through %d from '%s'", chunk_number, chunk_number + chunksize, self._path)
-                chunk = next(chunks)
-
-                # apply data converters in parallel if the dataframe is big enough
-                if chunk.shape[0] >= 25000:
-                    chunk = apply_parallel(chunk, self._apply_converters)
-                else:
-                    chunk = self._apply_converters(chunk)
+                try:
+                    chunk = self._convert(next(chunks))
+                except StopIteration:
+                    break
+
+                if write_cache:
+                    try:
+                        table = self._table_to_cache(chunk, schema)
+                        if writer is None:
+                            schema = table.schema
+                            writer = pa.ipc.new_file(tmp_path,
+                                                     schema,
+                                                     options=pa.ipc.IpcWriteOptions(compression="lz4"))
+                        writer.write_table(table)
+                    except OSError as e:
+                        # e.g. a read-only data set directory, the chunks are still returned
+                        log.warning("Failed to write cache '%s': %s", self.cache_path, str(e))
+                        write_cache = False
+                        self._discard_cache_writer(writer, tmp_path)
+                        writer = None
 
                 yield chunk
                 chunk_number += chunksize
                 if chunk.shape[0] < chunksize:
-                    return
-        except StopIteration:
-            return
+                    break
+
+            if writer is not None:
+                writer.close()
+                writer = None
+                try:
+                    os.replace(tmp_path, self.cache_path)
+                except OSError as e:
+                    log.warning("Failed to write cache '%s': %s", self.cache_path, str(e))
+                    self._remove_file(tmp_path)
+        finally:
+            # the chunks have not been read completely
+            self._discard_cache_writer(writer, tmp_path)
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @classmethod
+    def _discard_cache_writer(cls, writer, tmp_path):
+        """Closes an unfinished cache writer and removes its temporary file.
+
+        Args:
+            writer (pa.ipc.RecordBatchFileWriter): The writer or None.
+            tmp_path (str): The path of the temporary cache file.
+        """
+        if writer is not None:
+            try:
+                writer.close()
+            except OSError:
+                pass
+            cls._remove_file(tmp_path)
 
     @staticmethod
     def _read_files(files):
-        with fileinput.input(files) as lines:
-            for line in lines:
-                if not fileinput.isfirstline():
-                    yield line
+        """Reads the lines of csv files without their header lines. Each file is read at once and split into
+            lines in a single pass instead of reading it line by line.
 
-    def write_chunk(self, chunk):
+        Args:
+            files (str or List[str]): The file paths.
+
+        Yields:
+            str: The lines including their line separators.
+        """
+        if isinstance(files, str):
+            files = [files]
+
+        for fpath in files:
+            with open(fpath, "rb") as f:
+                buf = f.read()
+            header_end = buf.find(b"\n")
+            if header_end >= 0:
+                # universal newlines like in text mode
+                yield from io.StringIO(buf[header_end + 1:].decode(), newline=None)
+
+    def _pandas_write_chunk(self, chunk):
         if self._file is None:
             self._file = open(self._path, "w")
             # write header
-            headers = [
-                "Date first seen",
-                "Duration",
-                "Proto",
-                "Src IP Addr",
-                "Src Pt",
-                "Dst IP Addr",
-                "Dst Pt",
-                "Packets",
-                "Bytes",
-                "Flows",
-                "Flags",
-                "Tos",
-                "class",
-                "attackType",
-                "attackID",
-                "attackDescription",
-            ]
-            self._file.write(",".join(headers) + "\n")
+            self._file.write(",".join(self._file_headers) + "\n")
 
-        log.debug("Write chunk to '%s'", self._path)
-        chunk["flags"] = chunk["flags"].map(self._convert_flags_reverse)
         chunk.to_csv(self._file, header=False, index=False)
 
+    def _arrow_write_chunk(self, chunk):
+        table = pa.Table.from_pandas(chunk, preserve_index=False).rename_columns(self._file_headers)
+        for i, field in enumerate(table.schema):
+            if pa.types.is_floating(field.type):
+                # format floats like pandas, which keeps the ".0" of integral values
+                text = pa_compute.cast(table.column(i), pa.string())
+                integral = pa_compute.match_substring_regex(text, r"^-?[0-9]+$")
+                text = pa_compute.if_else(integral, pa_compute.binary_join_element_wise(text, ".0", ""), text)
+                table = table.set_column(i, field.name, text)
+
+        if self._schema is None:
+            # write the timestamps with millisecond precision and the categories as plain strings. Columns without
+            # any value in the first chunk are inferred as null type, which later chunks with values cannot be cast
+            # to, so they are written as strings.
+            schema = table.schema
+            for i, field in enumerate(schema):
+                if pa.types.is_timestamp(field.type):
+                    schema = schema.set(i, field.with_type(pa.timestamp("ms")))
+                elif pa.types.is_dictionary(field.type):
+                    schema = schema.set(i, field.with_type(field.type.value_type))
+                elif pa.types.is_null(field.type):
+                    schema = schema.set(i, field.with_type(pa.string()))
+            self._file = open(self._path, "wb")
+            # write header unquoted like the pandas writer
+            self._file.write((",".join(self._file_headers) + "\n").encode())
+            self._schema = schema
+
+        # pyarrow quotes all strings unless quoting is disabled, which fails for values with delimiters, quotes or
+        # line breaks. The chunk is written to a buffer first, so such a chunk, or one that cannot be cast to the
+        # schema of the first chunk, can be written by pandas instead, which quotes only these values.
+        buffer = pa.BufferOutputStream()
+        try:
+            pa_csv.write_csv(table.cast(self._schema), buffer,
+                             pa_csv.WriteOptions(include_header=False, quoting_style="none"))
+        except pa.ArrowException:
+            self._file.write(chunk.to_csv(header=False, index=False).encode())
+            return
+        self._file.write(buffer.getvalue())
+
+    def write_chunk(self, chunk):
+        log.debug("Write chunk to '%s'", self._path)
+        chunk["src_ip_addr"] = ipv4_to_str(chunk["src_ip_addr"])
+        chunk["dst_ip_addr"] = ipv4_to_str(chunk["dst_ip_addr"])
+        chunk["flags"] = self._convert_flags_reverse(chunk["flags"])
+
+        if HAVE_PYARROW:
+            self._arrow_write_chunk(chunk)
+        else:
+            self._pandas_write_chunk(chunk)
+
     def close(self):
+        self._schema = None
         if self._file is not None:
             self._file.close()
             self._file = None
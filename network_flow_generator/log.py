@@ -2,7 +2,6 @@ import logging
 import os
 import sys
 from enum import IntEnum
-import tensorflow as tf
 
 from network_flow_generator import __name__ as program_name
 
@@ -38,8 +37,9 @@ class Logger:
             format_str = "%(asctime)s %(levelname)-8s [%(pathname)s:%(lineno)d]: %(message)s"
         else:
             format_str = "%(asctime)s %(levelname)-8s: %(message)s"
-            # set logging for tensorflow
-            tf.get_logger().setLevel(logging.ERROR)
+            # set logging for tensorflow, its logger is configured by name because importing tensorflow takes
+            # several seconds
+            logging.getLogger("tensorflow").setLevel(logging.ERROR)
 
         if HAVE_COLORLOG and os.isatty(1):
             format_str = "%(log_color)s" + format_str
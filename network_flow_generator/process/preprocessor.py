@@ -1,40 +1,219 @@
+import bz2
+import gzip
+import io
+import lzma
 import os
+import zipfile
 
-from typing import Iterator, List
-from struct import unpack as struct_unpack
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
 
 import pandas as pd
 import numpy as np
 
+from network_flow_generator.io.cidds_file import CiddsFile
+from network_flow_generator.utils.cidds_utils import ipv4_to_str
 from network_flow_generator.utils.file_utils import ensure_file
+from network_flow_generator.utils.numba_utils import HAVE_NUMBA
 from network_flow_generator.log import Logger
 
+if HAVE_NUMBA:
+    import numba
+
+try:
+    import cupy as cp
+    HAVE_CUPY = True
+except ImportError:
+    HAVE_CUPY = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pa_parquet
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
 log = Logger.get()
 
 
+@contextmanager
+def _zip_open(fpath: str, mode: str = "wt", newline=None):
+    """Opens a text stream to a new zip archive with a single file. As in pandas, the file is named like the archive
+    without the .zip extension.
+
+    Args:
+        fpath (str): The path of the zip archive
+        mode (str, optional): Only "wt" is supported. Defaults to "wt".
+        newline (str, optional): The newline argument of the text stream. Defaults to None.
+
+    Yields:
+        io.TextIOWrapper: The text stream.
+    """
+    assert mode == "wt"
+    with zipfile.ZipFile(fpath, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(os.path.basename(fpath)[:-len(".zip")], "w", force_zip64=True) as raw:
+            with io.TextIOWrapper(raw, newline=newline) as f:
+                yield f
+
+
+if HAVE_NUMBA:
+
+    @numba.njit(inline="always")
+    def _write_bits(row, start, bits, value):
+        # unsigned shift operands, mixing uint64 and int64 would yield floats
+        value = np.uint64(value)
+        for j in range(bits):
+            row[start + j] = (value >> np.uint64(bits - 1 - j)) & np.uint64(1)
+
+    @numba.njit(parallel=True, cache=True)
+    def _binary_bits_kernel(dayofweek, proto_codes, src_ip_addr, src_pt, dst_ip_addr, dst_pt, packets, _bytes, flags,
+                            out):
+        for i in numba.prange(out.shape[0]):
+            row = out[i]
+            row[0:10] = 0
+            row[dayofweek[i]] = 1
+            if proto_codes[i] >= 0:
+                row[7 + proto_codes[i]] = 1
+            _write_bits(row, 10, 32, src_ip_addr[i])
+            _write_bits(row, 42, 16, src_pt[i])
+            _write_bits(row, 58, 32, dst_ip_addr[i])
+            _write_bits(row, 90, 16, dst_pt[i])
+            _write_bits(row, 106, 32, packets[i])
+            _write_bits(row, 138, 32, _bytes[i])
+            _write_bits(row, 170, 6, flags[i])
+
+
 class Preprocessor:
 
+    _weekday_columns = ["isMonday", "isTuesday", "isWednesday", "isThursday", "isFriday", "isSaturday", "isSunday"]
+    _proto_columns = ["isTCP", "isUDP", "isICMP"]
+    _flag_columns = ["isURG", "isACK", "isPSH", "isRES", "isSYN", "isFIN"]
+
+    # openers of the compressed csv files, which are chosen by the file extension
+    _csv_openers = {
+        ".gz": gzip.open,
+        ".bz2": bz2.open,
+        ".xz": lzma.open,
+        ".zip": _zip_open,
+    }
+
+    # input columns, which are scaled to the range [0, 1] using their minimum and maximum
+    _normalized_columns = []
+
     def __init__(self, df: Iterator[pd.DataFrame]):
         self._df = df
+        self._ranges = {}
 
-    def save(self, fpath: str, force=False) -> None:
-        """Saves the processed dataframe to a csv file.
+    @classmethod
+    def from_csv(cls, path: str, chunksize=None, nrows=None, use_cache=True, use_gpu=False) -> "Preprocessor":
+        """Creates a preprocessor for a CIDDS csv file, which is fitted on the whole file.
+
+        The file is read by CiddsFile, so the chunks arrive with typed columns, e.g. ip addresses as uint32 and
+        tcp flags as uint8 bit masks, instead of strings.
+
+        Args:
+            path (str): The path of the csv file.
+            chunksize (int, optional): The number of rows per chunk. If None it is chosen by the file size. Defaults
+                to None.
+            nrows (int, optional): The number of rows to read. If None the whole file is read. Defaults to None.
+            use_cache (bool, optional): Cache the converted data in a feather file next to the csv file. Requires
+                pyarrow. Defaults to True.
+            use_gpu (bool, optional): Parse the csv file on the GPU. Requires cudf. Defaults to False.
+
+        Returns:
+            Preprocessor: The fitted preprocessor.
+        """
+        cidds_file = CiddsFile(path, use_cache=use_cache, use_gpu=use_gpu)
+        preprocessor = cls(cidds_file.read_chunks(chunksize=chunksize, nrows=nrows))
+        # a second pass over the file computes the normalization ranges of all chunks. It reads only the normalized
+        # columns, so without a valid cache only these columns are parsed twice.
+        columns = cls._normalized_columns or None
+        return preprocessor.fit(cidds_file.read_chunks(chunksize=chunksize, nrows=nrows, columns=columns))
+
+    def fit(self, df: Iterator[pd.DataFrame]) -> "Preprocessor":
+        """Computes the minimum and maximum of the normalized columns over the whole data set, so all chunks are
+        normalized alike. Without fitting each chunk is normalized with its own minimum and maximum.
+
+        Args:
+            df (Iterator[pd.DataFrame]): The chunks of the data set, e.g. a second reader of the same file. They are
+                not consumed if the preprocessor has no normalized columns.
+
+        Returns:
+            Preprocessor: The preprocessor itself.
+        """
+        if not self._normalized_columns:
+            return self
+
+        minimum = maximum = None
+        for chunk in df:
+            # np.fmin and np.fmax ignore the NaN minimum and maximum of empty chunks
+            chunk = chunk[self._normalized_columns]
+            minimum = chunk.min() if minimum is None else np.fmin(minimum, chunk.min())
+            maximum = chunk.max() if maximum is None else np.fmax(maximum, chunk.max())
+
+        if minimum is not None:
+            self._ranges = {column: (minimum[column], maximum[column]) for column in self._normalized_columns}
+        return self
+
+    def save(self, fpath: str, force=False, prefetch=2) -> None:
+        """Saves the processed dataframe to a csv file or, if the path ends with .parquet, to a parquet file.
+
+        The processed chunks are written in a background thread, while the next chunks are processed. Csv files
+        are compressed as a single stream if the path ends with .gz, .bz2, .xz or .zip.
 
         Args:
             fpath (str): The file path
             force (bool, optional): Overwrite an existing file. Defaults to False.
+            prefetch (int, optional): The maximum number of processed chunks waiting to be written. Defaults to 2.
 
         Raises:
             OSError: If the given path exists and is not a file.
             FileExistsError: If file already exists and force is set to false.
+            ImportError: If a parquet file shall be written, but pyarrow is not installed.
         """
+        if fpath.endswith(".parquet"):
+            if not HAVE_PYARROW:
+                raise ImportError("Writing parquet files requires pyarrow")
+            ensure_file(fpath, force)
+            self._save_parquet(fpath, prefetch)
+            return
+
         ensure_file(fpath, force)
 
-        first_chunk = True
-        for df in self._df:
-            df = self._process(df)
-            df.to_csv(fpath, mode="a", compression="infer", header=first_chunk, index=False)
-            first_chunk = False
+        opener = self._csv_openers.get(os.path.splitext(fpath)[1], open)
+        with opener(fpath, "wt", newline="") as f:
+            first_chunk = True
+
+            def write(df):
+                nonlocal first_chunk
+                df.to_csv(f, header=first_chunk, index=False)
+                first_chunk = False
+
+            self._write_behind(write, prefetch)
+
+    def _save_parquet(self, fpath: str, prefetch=2) -> None:
+        """Saves the processed dataframe to a parquet file with one row group per chunk.
+
+        Args:
+            fpath (str): The file path
+            prefetch (int, optional): The maximum number of processed chunks waiting to be written. Defaults to 2.
+        """
+        writer = None
+
+        def write(df):
+            nonlocal writer
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                writer = pa_parquet.ParquetWriter(fpath, table.schema, compression="zstd")
+            writer.write_table(table)
+
+        try:
+            self._write_behind(write, prefetch)
+        finally:
+            if writer is not None:
+                writer.close()
 
     def get(self) -> Iterator[pd.DataFrame]:
         """Gets the processed dataframe.
@@ -46,6 +225,114 @@ class Preprocessor:
             df = self._process(df)
             yield df
 
+    def _write_behind(self, write, prefetch=2) -> None:
+        """Processes the chunks on the calling thread, while the processed chunks are written in a background thread.
+
+        The chunks are processed on the calling thread, because the parallel numba kernels of the preprocessors must
+        not be launched from other threads, e.g. the TBB threading layer hangs at interpreter exit otherwise. At most
+        prefetch processed chunks wait to be written, so the memory usage stays bounded for large chunks.
+
+        Args:
+            write (Callable[[pd.DataFrame], None]): Writes a processed chunk. It is called by a single thread in the
+                order of the input chunks.
+            prefetch (int, optional): The maximum number of processed chunks waiting to be written. Defaults to 2.
+        """
+        with ThreadPoolExecutor(1) as executor:
+            pending = deque()
+            for df in self._df:
+                pending.append(executor.submit(write, self._process(df)))
+                if len(pending) >= max(1, prefetch):
+                    pending.popleft().result()
+            while pending:
+                pending.popleft().result()
+
+    def _normalize(self, series: pd.Series, name: str) -> pd.Series:
+        """Scales a numeric column to the range [0, 1] using the minimum and maximum of the fitted data set or, if the
+        preprocessor was not fitted, of the column itself.
+
+        Args:
+            series (pd.Series): The column to normalize
+            name (str): The name of the resulting column
+
+        Returns:
+            pd.Series: The normalized column as float32. A constant column is mapped to 0.
+        """
+        values = series.to_numpy(dtype=np.float32, copy=True)
+        if series.name in self._ranges:
+            min_value, max_value = (np.float32(v) for v in self._ranges[series.name])
+        elif len(values) > 0:
+            min_value, max_value = values.min(), values.max()
+        else:
+            return pd.Series(values, index=series.index, name=name)
+        values -= min_value
+        values /= max_value - min_value + np.float32(1e-20)
+        return pd.Series(values, index=series.index, name=name)
+
+    def _join_columns(self, parts: List, index: pd.Index) -> pd.DataFrame:
+        """Joins series and dataframes column-wise. The result is built from a dict of the underlying arrays, so
+        unlike pd.concat no indexes are aligned.
+
+        Args:
+            parts (List): The series and dataframes to join, which all have the given index
+            index (pd.Index): The index of the resulting dataframe
+
+        Returns:
+            pd.DataFrame: The joined dataframe.
+        """
+        columns = {}
+        for part in parts:
+            if isinstance(part, pd.DataFrame):
+                columns.update((name, part[name].values) for name in part.columns)
+            else:
+                columns[part.name] = part.values
+        return pd.DataFrame(columns, index=index)
+
+    def _split_timestamps(self, series: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+        """Splits timestamps into the day of the week and the time of the day. Both are derived from the same cast
+        to whole days.
+
+        Args:
+            series (pd.Series): The timestamps
+
+        Returns:
+            Tuple[np.ndarray, pd.Series]: The day of the week with monday being 0 and the time of the day scaled to
+                the range [0, 1) as float32 series with the name of the timestamps.
+        """
+        timestamps = series.to_numpy().astype("datetime64[ns]")
+        days = timestamps.astype("datetime64[D]")
+        # the unix epoch was a thursday
+        dayofweek = (days.view(np.int64) + 3) % 7
+        seconds = (timestamps - days).astype("timedelta64[s]").astype(np.float32)
+        daytime = pd.Series(seconds / np.float32(86400), index=series.index, name=series.name)
+        return dayofweek, daytime
+
+    def _onehot(self, codes: np.ndarray, names: List[str], index: pd.Index) -> pd.DataFrame:
+        """Converts categorical codes to one column per category by gathering rows of an identity matrix.
+
+        Args:
+            codes (np.ndarray): The codes of the categories. The code -1 of unknown categories results in zeros only.
+            names (List[str]): The column names of the categories
+            index (pd.Index): The index of the resulting dataframe
+
+        Returns:
+            pd.DataFrame: One uint8 column per category.
+        """
+        # the additional all zero last row is selected by the code -1
+        identity = np.eye(len(names) + 1, len(names), dtype=np.uint8)
+        return pd.DataFrame(np.take(identity, codes, axis=0), columns=names, index=index)
+
+    def _unpack_flags(self, series: pd.Series) -> pd.DataFrame:
+        """Converts the tcp flags bit mask to one column per flag.
+
+        Args:
+            series (pd.Series): The flags as uint8 bit mask with URG in bit 5 and FIN in bit 0
+
+        Returns:
+            pd.DataFrame: One uint8 column per flag, ordered from URG to FIN.
+        """
+        bit_matrix = np.unpackbits(series.values.astype(np.uint8)[:, np.newaxis], axis=1)[:, 2:]
+        return pd.DataFrame(bit_matrix, columns=self._flag_columns, index=series.index)
+
     def _process(self, df: pd.DataFrame):
         """Processes a single pandas dataframe.
 
@@ -57,101 +344,164 @@ class Preprocessor:
 
 class CiddsBinaryPreprocessor(Preprocessor):
 
-    def _unpack_bits(self, number: int, bits: int) -> List[np.uint8]:
-        """Converts a decimal number to a binary number.
+    _bit_columns = (Preprocessor._weekday_columns + Preprocessor._proto_columns +
+                    ["src_ip_" + str(i) for i in range(32)] + ["src_pt_" + str(i) for i in range(16)] +
+                    ["dst_ip_" + str(i) for i in range(32)] + ["dst_pt_" + str(i) for i in range(16)] +
+                    ["pck_" + str(i) for i in range(32)] + ["byt_" + str(i) for i in range(32)] +
+                    Preprocessor._flag_columns)
+    _normalized_columns = ["duration"]
 
-        Args:
-            number (int): A decimal number to convert
-            bits (int): Number of bits the resulting binary number shall have.
+    def _unpack_column(self, series: pd.Series, out: np.ndarray) -> None:
+        """Converts a column of decimal numbers to binary numbers.
 
-        Returns:
-            List[np.uint8]: Binary representation of the decimal number as a list of bits.
+        Args:
+            series (pd.Series): The decimal numbers to convert
+            out (np.ndarray): The uint8 matrix the bits are written to. Its number of columns is the number of bits
+                the resulting binary numbers shall have. It must be 8, 16, 32 or 64.
         """
-        dtype = {
-            8: ">i1",
-            16: ">i2",
-            32: ">i4",
-        }.get(bits, ">i4")
-        return np.unpackbits(np.array([number], dtype=dtype).view(np.uint8))
-
-    def _process(self, df: pd.DataFrame):
-        """Processes a single pandas dataframe in cidds format to be used with tensorflow.
+        bits = out.shape[1]
+        # big endian, so the most significant bit comes first
+        numbers = series.values.astype(">u%d" % (bits // 8))
+        out[:] = np.unpackbits(numbers.view(np.uint8).reshape(-1, bits // 8), axis=1)
 
-        Usefull information: https://www.tensorflow.org/tutorials/structured_data/feature_columns
+    def _bit_matrix(self, df: pd.DataFrame, dayofweek: np.ndarray, proto_codes: np.ndarray) -> np.ndarray:
+        """Builds the uint8 matrix of all bit columns.
 
         Args:
             df (pd.DataFrame): The dataframe to process
+            dayofweek (np.ndarray): The day of the week of each flow with monday being 0
+            proto_codes (np.ndarray): The codes of the protocols TCP, UDP and ICMP, -1 for other protocols
+
+        Returns:
+            np.ndarray: The bit matrix with one column per bit column name.
         """
-        log.debug("Processing dataframe")
+        bits = np.empty((len(df), len(self._bit_columns)), dtype=np.uint8)
 
-        # date_first_seen
-        indicies = [
-            "isMonday",
-            "isTuesday",
-            "isWednesday",
-            "isThursday",
-            "isFriday",
-            "isSaturday",
-            "isSunday",
-        ]
-        dayofweek = df["date_first_seen"].dt.dayofweek
-        weekdays = []
-        for i, weekday in enumerate(indicies):
-            weekdays.append((dayofweek == i).map(int).rename(weekday))
-        daytime = (df["date_first_seen"] -
-                   df["date_first_seen"].astype("datetime64[D]")).apply(lambda v: v.seconds / 86400)
+        if HAVE_NUMBA:
+            # all bit columns in a single parallel pass over the rows
+            _binary_bits_kernel(dayofweek, proto_codes, df["src_ip_addr"].values, df["src_pt"].values,
+                                df["dst_ip_addr"].values, df["dst_pt"].values, df["packets"].values,
+                                df["bytes"].values, df["flags"].values, bits)
+            return bits
 
-        # duration
-        # normalize over chunk
-        min_duration = df["duration"].min()
-        max_duration = df["duration"].max()
-        norm_duration = ((df["duration"] - min_duration) / (max_duration - min_duration)).rename("norm_dur")
+        # date_first_seen
+        bits[:, 0:7] = self._onehot(dayofweek, self._weekday_columns, df.index).values
 
         # proto
-        proto_tcp = (df["proto"] == "TCP").apply(int).rename("isTCP")
-        proto_udp = (df["proto"] == "UDP").apply(int).rename("isUDP")
-        proto_icmp = (df["proto"] == "ICMP").apply(int).rename("isICMP")
+        bits[:, 7:10] = self._onehot(proto_codes, self._proto_columns, df.index).values
 
         # src_ip_addr
-        indicies = ["src_ip_" + str(i) for i in range(32)]
-        src_ip_addr = df["src_ip_addr"].apply(lambda v: pd.Series(self._unpack_bits(int(v), 32), index=indicies))
+        self._unpack_column(df["src_ip_addr"], bits[:, 10:42])
 
         # src_pt
-        indicies = ["src_pt_" + str(i) for i in range(16)]
-        src_pt = df["src_pt"].apply(lambda v: pd.Series(self._unpack_bits(int(v), 16), index=indicies))
+        self._unpack_column(df["src_pt"], bits[:, 42:58])
 
         # dst_ip_addr
-        indicies = ["dst_ip_" + str(i) for i in range(32)]
-        dst_ip_addr = df["dst_ip_addr"].apply(lambda v: pd.Series(self._unpack_bits(int(v), 32), index=indicies))
+        self._unpack_column(df["dst_ip_addr"], bits[:, 58:90])
 
         # dst_pt
-        indicies = ["dst_pt_" + str(i) for i in range(16)]
-        dst_pt = df["dst_pt"].apply(lambda v: pd.Series(self._unpack_bits(int(v), 16), index=indicies))
+        self._unpack_column(df["dst_pt"], bits[:, 90:106])
 
         # packets
-        indicies = ["pck_" + str(i) for i in range(32)]
-        packets = df["packets"].apply(lambda v: pd.Series(self._unpack_bits(int(v), 32), index=indicies))
+        self._unpack_column(df["packets"], bits[:, 106:138])
 
         # bytes
-        indicies = ["byt_" + str(i) for i in range(32)]
-        _bytes = df["bytes"].apply(lambda v: pd.Series(self._unpack_bits(int(v), 32), index=indicies))
+        self._unpack_column(df["bytes"], bits[:, 138:170])
 
         # tcp flags
-        indicies = ["isURG", "isACK", "isPSH", "isRES", "isSYN", "isFIN"]
-        flags = df["flags"].apply(lambda v: pd.Series(map(int, v), index=indicies))
+        bits[:, 170:176] = self._unpack_flags(df["flags"]).values
+
+        return bits
+
+    def _process(self, df: pd.DataFrame):
+        """Processes a single pandas dataframe in cidds format to be used with tensorflow.
+
+        All bit columns are written into a single preallocated uint8 matrix, only the two float columns are kept
+        separately.
+
+        Usefull information: https://www.tensorflow.org/tutorials/structured_data/feature_columns
+
+        Args:
+            df (pd.DataFrame): The dataframe to process
+        """
+        log.debug("Processing dataframe")
+
+        # date_first_seen
+        dayofweek, daytime = self._split_timestamps(df["date_first_seen"])
+
+        # duration
+        # normalize over the fitted data set or the chunk
+        norm_duration = self._normalize(df["duration"], "norm_dur")
+
+        # proto
+        codes = pd.Categorical(df["proto"], categories=["TCP", "UDP", "ICMP"]).codes
+
+        bits = self._bit_matrix(df, dayofweek, codes)
 
         # create DataFrame
-        all_series = weekdays + [
-            daytime, norm_duration, proto_tcp, proto_udp, proto_icmp, src_ip_addr, src_pt, dst_ip_addr, dst_pt, packets,
-            _bytes, flags
-        ]
-        processed_df = pd.concat(all_series, axis=1)
+        processed_df = pd.DataFrame(bits, columns=self._bit_columns, index=df.index, copy=False)
+        processed_df.insert(7, daytime.name, daytime)
+        processed_df.insert(8, norm_duration.name, norm_duration)
 
         return processed_df
 
 
+class CiddsBinaryGpuPreprocessor(CiddsBinaryPreprocessor):
+    """Variant of the binary preprocessor, which builds the bit matrix on the GPU with cupy. The chunks are still
+    read and converted on the CPU, only the integer columns are copied to the GPU and the finished bit matrix is
+    copied back.
+    """
+
+    def __init__(self, df: Iterator[pd.DataFrame]):
+        """
+        Args:
+            df (Iterator[pd.DataFrame]): The chunks to process
+
+        Raises:
+            ImportError: If cupy is not installed.
+        """
+        if not HAVE_CUPY:
+            raise ImportError("Preprocessing on the GPU requires cupy")
+        super().__init__(df)
+
+    def _unpack_gpu(self, values: np.ndarray, out) -> None:
+        """Writes the binary representation of unsigned integers into a slice of a bit matrix on the GPU.
+
+        Args:
+            values (np.ndarray): The input values, which are truncated to the number of bits
+            out (cp.ndarray): The uint8 matrix the bits are written to, the most significant bit first
+        """
+        bits = out.shape[1]
+        dtype = np.min_scalar_type(2**bits - 1)
+        numbers = cp.asarray(values.astype(dtype))
+        shifts = cp.arange(bits - 1, -1, -1, dtype=dtype)
+        out[...] = (numbers[:, cp.newaxis] >> shifts) & 1
+
+    def _bit_matrix(self, df: pd.DataFrame, dayofweek: np.ndarray, proto_codes: np.ndarray) -> np.ndarray:
+        bits = cp.empty((len(df), len(self._bit_columns)), dtype=cp.uint8)
+
+        # one-hot encodings, the additional all zero last row is selected by the code -1
+        bits[:, 0:7] = cp.eye(8, 7, dtype=cp.uint8)[cp.asarray(dayofweek)]
+        bits[:, 7:10] = cp.eye(4, 3, dtype=cp.uint8)[cp.asarray(proto_codes)]
+
+        # integer columns
+        self._unpack_gpu(df["src_ip_addr"].values, bits[:, 10:42])
+        self._unpack_gpu(df["src_pt"].values, bits[:, 42:58])
+        self._unpack_gpu(df["dst_ip_addr"].values, bits[:, 58:90])
+        self._unpack_gpu(df["dst_pt"].values, bits[:, 90:106])
+        self._unpack_gpu(df["packets"].values, bits[:, 106:138])
+        self._unpack_gpu(df["bytes"].values, bits[:, 138:170])
+        self._unpack_gpu(df["flags"].values, bits[:, 170:176])
+
+        return cp.asnumpy(bits)
+
+
 class CiddsNumericPreprocessor(Preprocessor):
 
+    _src_ip_columns = ["src_ip_" + str(i) for i in range(4)]
+    _dst_ip_columns = ["dst_ip_" + str(i) for i in range(4)]
+    _normalized_columns = ["duration", "packets", "bytes"]
+
     def _process(self, df: pd.DataFrame):
         """Processes a single pandas dataframe in cidds format to be used with tensorflow.
 
@@ -162,69 +512,46 @@ class CiddsNumericPreprocessor(Preprocessor):
         """
         log.debug("Processing dataframe")
 
-        indicies = [
-            "isMonday",
-            "isTuesday",
-            "isWednesday",
-            "isThursday",
-            "isFriday",
-            "isSaturday",
-            "isSunday",
-        ]
-        dayofweek = df["date_first_seen"].dt.dayofweek
-        weekdays = []
-        for i, weekday in enumerate(indicies):
-            weekdays.append((dayofweek == i).map(int).rename(weekday))
-        daytime = (df["date_first_seen"] -
-                   df["date_first_seen"].astype("datetime64[D]")).apply(lambda v: v.seconds / 86400)
+        dayofweek, daytime = self._split_timestamps(df["date_first_seen"])
+        weekdays = self._onehot(dayofweek, self._weekday_columns, df.index)
 
         # duration
-        # normalize over chunk
-        min_duration = df["duration"].min()
-        max_duration = df["duration"].max()
-        norm_duration = ((df["duration"] - min_duration) / (max_duration - min_duration)).rename("norm_dur")
+        # normalize over the fitted data set or the chunk
+        norm_duration = self._normalize(df["duration"], "norm_dur")
 
         # proto
-        proto_tcp = (df["proto"] == "TCP").apply(int).rename("isTCP")
-        proto_udp = (df["proto"] == "UDP").apply(int).rename("isUDP")
-        proto_icmp = (df["proto"] == "ICMP").apply(int).rename("isICMP")
+        codes = pd.Categorical(df["proto"], categories=["TCP", "UDP", "ICMP"]).codes
+        proto = self._onehot(codes, self._proto_columns, df.index)
 
         # src_ip_addr
-        indicies = ["src_ip_" + str(i) for i in range(4)]
-        src_ip_addr = df["src_ip_addr"].apply(
-            lambda v: pd.Series([x / 255 for x in struct_unpack('BBBB', v.packed)], index=indicies))
+        octets = df["src_ip_addr"].values.astype(">u4").view(np.uint8).reshape(-1, 4)
+        src_ip_addr = pd.DataFrame(octets.astype(np.float32) / 255, columns=self._src_ip_columns, index=df.index)
 
         # src_pt
-        src_pt = df["src_pt"].apply(lambda v: v / 65535).rename("src_pt")
+        src_pt = pd.Series(df["src_pt"].values.astype(np.float32) / np.float32(65535), index=df.index, name="src_pt")
 
         # dst_ip_addr
-        indicies = ["dst_ip_" + str(i) for i in range(4)]
-        dst_ip_addr = df["dst_ip_addr"].apply(
-            lambda v: pd.Series([x / 255 for x in struct_unpack('BBBB', v.packed)], index=indicies))
+        octets = df["dst_ip_addr"].values.astype(">u4").view(np.uint8).reshape(-1, 4)
+        dst_ip_addr = pd.DataFrame(octets.astype(np.float32) / 255, columns=self._dst_ip_columns, index=df.index)
 
         # dst_pt
-        dst_pt = df["dst_pt"].apply(lambda v: v / 65535).rename("dst_pt")
+        dst_pt = pd.Series(df["dst_pt"].values.astype(np.float32) / np.float32(65535), index=df.index, name="dst_pt")
 
         # packets
-        min_packets = df["packets"].min()
-        max_packets = df["packets"].max()
-        norm_packets = ((df["packets"] - min_packets) / (max_packets - min_packets)).rename("norm_pck")
+        norm_packets = self._normalize(df["packets"], "norm_pck")
 
         # bytes
-        min_bytes = df["bytes"].min()
-        max_bytes = df["bytes"].max()
-        norm_bytes = ((df["bytes"] - min_bytes) / (max_bytes - min_bytes)).rename("norm_byt")
+        norm_bytes = self._normalize(df["bytes"], "norm_byt")
 
         # tcp flags
-        indicies = ["isURG", "isACK", "isPSH", "isRES", "isSYN", "isFIN"]
-        flags = df["flags"].apply(lambda v: pd.Series(map(int, v), index=indicies))
+        flags = self._unpack_flags(df["flags"])
 
         # create DataFrame
-        all_series = weekdays + [
-            daytime, norm_duration, proto_tcp, proto_udp, proto_icmp, src_ip_addr, src_pt, dst_ip_addr, dst_pt,
-            norm_packets, norm_bytes, flags
+        all_series = [
+            weekdays, daytime, norm_duration, proto, src_ip_addr, src_pt, dst_ip_addr, dst_pt, norm_packets, norm_bytes,
+            flags
         ]
-        processed_df = pd.concat(all_series, axis=1)
+        processed_df = self._join_columns(all_series, df.index)
 
         return processed_df
 
@@ -241,38 +568,24 @@ class CiddsEmbeddingPreprocessor(Preprocessor):
         """
         log.debug("Processing dataframe")
 
-        indicies = [
-            "isMonday",
-            "isTuesday",
-            "isWednesday",
-            "isThursday",
-            "isFriday",
-            "isSaturday",
-            "isSunday",
-        ]
-        dayofweek = df["date_first_seen"].dt.dayofweek
-        weekdays = []
-        for i, weekday in enumerate(indicies):
-            weekdays.append((dayofweek == i).map(int).rename(weekday))
-        daytime = (df["date_first_seen"] -
-                   df["date_first_seen"].astype("datetime64[D]")).apply(lambda v: v.seconds / 86400)
+        dayofweek, daytime = self._split_timestamps(df["date_first_seen"])
+        weekdays = self._onehot(dayofweek, self._weekday_columns, df.index)
 
         # duration
         duration = df["duration"]
 
         # proto
-        proto_tcp = (df["proto"] == "TCP").apply(int).rename("isTCP")
-        proto_udp = (df["proto"] == "UDP").apply(int).rename("isUDP")
-        proto_icmp = (df["proto"] == "ICMP").apply(int).rename("isICMP")
+        codes = pd.Categorical(df["proto"], categories=["TCP", "UDP", "ICMP"]).codes
+        proto = self._onehot(codes, self._proto_columns, df.index)
 
         # src_ip_addr
-        src_ip_addr = df["src_ip_addr"].astype("str")
+        src_ip_addr = ipv4_to_str(df["src_ip_addr"])
 
         # src_pt
         src_pt = df["src_pt"]
 
         # dst_ip_addr
-        dst_ip_addr = df["dst_ip_addr"].astype("str")
+        dst_ip_addr = ipv4_to_str(df["dst_ip_addr"])
 
         # dst_pt
         dst_pt = df["dst_pt"]
@@ -284,14 +597,12 @@ class CiddsEmbeddingPreprocessor(Preprocessor):
         _bytes = df["bytes"]
 
         # tcp flags
-        indicies = ["isURG", "isACK", "isPSH", "isRES", "isSYN", "isFIN"]
-        flags = df["flags"].apply(lambda v: pd.Series(map(int, v), index=indicies))
+        flags = self._unpack_flags(df["flags"])
 
         # create DataFrame
-        all_series = weekdays + [
-            daytime, duration, proto_tcp, proto_udp, proto_icmp, src_ip_addr, src_pt, dst_ip_addr, dst_pt, packets,
-            _bytes, flags
+        all_series = [
+            weekdays, daytime, duration, proto, src_ip_addr, src_pt, dst_ip_addr, dst_pt, packets, _bytes, flags
         ]
-        processed_df = pd.concat(all_series, axis=1)
+        processed_df = self._join_columns(all_series, df.index)
 
         return processed_df
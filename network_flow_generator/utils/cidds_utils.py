@@ -1,7 +1,17 @@
+import ipaddress
 import types
 
+import numpy as np
 import pandas as pd
 
+# bits of the TCP flag bit masks, which are laid out like in the TCP header
+TCP_FLAG_URG = 0x20
+TCP_FLAG_ACK = 0x10
+TCP_FLAG_PSH = 0x08
+TCP_FLAG_RST = 0x04
+TCP_FLAG_SYN = 0x02
+TCP_FLAG_FIN = 0x01
+
 
 def filter(data, query):
     if isinstance(data, pd.io.parsers.TextFileReader):
@@ -11,16 +21,88 @@ def filter(data, query):
         return data[query]
 
 
-def _filter_chunk_by_day(chunk, day):
-    # return chunk[chunk.date_first_seen - date < np.timedelta64(1, "D") and chunk.date_first_seen - date < np.timedelta64(1, "D")]
-    helper = chunk.date_first_seen.astype("datetime64[D]")
-    return chunk[helper == day]
+def _filter_chunk_by_day(chunk, start, end):
+    timestamps = chunk["date_first_seen"].values
+    return chunk[(timestamps >= start) & (timestamps < end)]
 
 
 def filter_by_day(data, day):
-    day = day.astype("datetime64[D]")
+    """Filters flows by the day they were first seen. The timestamps are compared against the half-open range of the
+    day, so they do not need to be cast to days.
+
+    Args:
+        data (pd.DataFrame or Iterator[pd.DataFrame]): A dataframe or a generator of chunks.
+        day (np.datetime64 or str): The day, e.g. ``"2017-03-15"``. A time of the day is ignored.
+
+    Returns:
+        pd.DataFrame or Iterator[pd.DataFrame]: The filtered dataframe or a generator of filtered chunks.
+    """
+    start = np.datetime64(day, "D")
+    end = start + np.timedelta64(1, "D")
     if isinstance(data, types.GeneratorType):
-        for chunk in data:
-            yield _filter_chunk_by_day(chunk, day)
-    else:
-        return _filter_chunk_by_day(data, day)
+        return (_filter_chunk_by_day(chunk, start, end) for chunk in data)
+    return _filter_chunk_by_day(data, start, end)
+
+
+def _filter_chunk_by_subnet(chunk, column, network_address, netmask):
+    return chunk[(chunk[column].values & netmask) == network_address]
+
+
+def filter_by_subnet(data, network, column="src_ip_addr"):
+    """Filters flows by the subnet of an ip address column. As the ip addresses are stored as ``uint32`` values,
+    the filter needs only a bitwise and and a comparison per row.
+
+    Args:
+        data (pd.DataFrame or Iterator[pd.DataFrame]): A dataframe or a generator of chunks.
+        network (str): The subnet in CIDR notation, e.g. ``"192.168.100.0/24"``.
+        column (str, optional): The ip address column. Defaults to "src_ip_addr".
+
+    Returns:
+        pd.DataFrame or Iterator[pd.DataFrame]: The filtered dataframe or a generator of filtered chunks.
+    """
+    network = ipaddress.IPv4Network(network)
+    network_address = np.uint32(int(network.network_address))
+    netmask = np.uint32(int(network.netmask))
+    if isinstance(data, types.GeneratorType):
+        return (_filter_chunk_by_subnet(chunk, column, network_address, netmask) for chunk in data)
+    return _filter_chunk_by_subnet(data, column, network_address, netmask)
+
+
+def _filter_chunk_by_flags(chunk, mask, value):
+    return chunk[(chunk["flags"].values & mask) == value]
+
+
+def filter_by_flags(data, set_flags=0, cleared_flags=0):
+    """Filters flows by their TCP flags, e.g. ``filter_by_flags(df, TCP_FLAG_SYN, TCP_FLAG_ACK)`` selects the flows
+    with SYN set and ACK cleared.
+
+    Args:
+        data (pd.DataFrame or Iterator[pd.DataFrame]): A dataframe or a generator of chunks.
+        set_flags (int, optional): Bit mask of the flags that must be set. Defaults to 0.
+        cleared_flags (int, optional): Bit mask of the flags that must be cleared. Defaults to 0.
+
+    Returns:
+        pd.DataFrame or Iterator[pd.DataFrame]: The filtered dataframe or a generator of filtered chunks.
+    """
+    mask = np.uint8(set_flags | cleared_flags)
+    value = np.uint8(set_flags)
+    if isinstance(data, types.GeneratorType):
+        return (_filter_chunk_by_flags(chunk, mask, value) for chunk in data)
+    return _filter_chunk_by_flags(data, mask, value)
+
+
+def ipv4_to_str(ipv4_addresses):
+    """Converts ``uint32`` ip addresses into their dotted string representation.
+
+    Args:
+        ipv4_addresses (pd.Series): The ip addresses to convert.
+
+    Returns:
+        pd.Series: The ip addresses as strings.
+    """
+    values = ipv4_addresses.values.astype(np.uint32)
+    octets = [
+        pd.Series((values >> shift) & 0xFF, index=ipv4_addresses.index, name=ipv4_addresses.name).astype("str")
+        for shift in (24, 16, 8, 0)
+    ]
+    return octets[0].str.cat(octets[1:], sep=".")
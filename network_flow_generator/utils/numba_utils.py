@@ -0,0 +1,42 @@
+import numpy as np
+
+try:
+    import numba
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+if HAVE_NUMBA:
+
+    # not parallel, as it is called from the worker threads of apply_parallel and numba's threading layers do not
+    # support launching parallel kernels from several threads at once
+    @numba.njit(cache=True)
+    def _scale_where_kernel(values, mask, factor, out):
+        for i in range(values.shape[0]):
+            if mask[i]:
+                out[i] = values[i] * factor
+            else:
+                out[i] = values[i]
+
+
+def scale_where(values, mask, factor, dtype):
+    """Scales the values where the mask is set and casts all values to the given data type. With numba the
+    selection, multiplication and cast are fused into a single pass without temporary arrays.
+
+    Args:
+        values (np.ndarray): The input values.
+        mask (np.ndarray): Boolean mask of the values that shall be scaled.
+        factor (float): The scaling factor.
+        dtype (np.dtype): The data type of the result.
+
+    Returns:
+        np.ndarray: The scaled values.
+    """
+    out = np.empty(values.shape[0], dtype=dtype)
+    if HAVE_NUMBA:
+        _scale_where_kernel(values, mask, factor, out)
+    else:
+        # cast directly into the result and only scale the (usually few) selected values afterwards
+        np.copyto(out, values, casting="unsafe")
+        out[mask] = values[mask] * factor
+    return out
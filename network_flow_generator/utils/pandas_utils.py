@@ -1,21 +1,54 @@
-from multiprocessing import Pool, cpu_count
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import cpu_count
 
 import numpy as np
 import pandas as pd
 
 
-def apply_parallel(df, func, num_processes=None):
+def apply_parallel(df, func, num_threads=None, min_partition_size=1):
     """Apply a function on a Pandas DataFrame in parallel.
 
+    The dataframe is split into row ranges, which are processed by a pool of threads. Unlike a process pool the
+    splits do not need to be pickled, but the function should spend most of its time in vectorized pandas or
+    numpy operations that release the GIL.
+
     Args:
         df (pd.core.frame.DataFrame): The dataframe
         func (function): The function to apply
-        num_processes (int, optional): The number of processes to create. If None the CPU count is used. Defaults to None.
+        num_threads (int, optional): The number of threads to create. If None the CPU count is used. Defaults to None.
+        min_partition_size (int, optional): The minimum number of rows per partition. The dataframe is split into
+            fewer partitions than threads if it is too small. Defaults to 1.
 
     Returns:
         pd.core.frame.DataFrame: A new dataframe with the function applied
     """
-    num_processes = num_processes or cpu_count()
-    with Pool(num_processes) as pool:
-        splitted_df = np.array_split(df, num_processes)
-        return pd.concat(pool.map(func, splitted_df))
+    num_threads = num_threads or cpu_count()
+    num_threads = max(1, min(num_threads, df.shape[0] // min_partition_size))
+    if num_threads == 1:
+        return func(df)
+
+    bounds = np.linspace(0, df.shape[0], num_threads + 1, dtype=int)
+    # shallow copies of the row ranges, so the function can assign columns without affecting the dataframe
+    splitted_df = [df.iloc[start:stop].copy(deep=False) for start, stop in zip(bounds[:-1], bounds[1:])]
+    with ThreadPoolExecutor(num_threads) as executor:
+        return pd.concat(executor.map(func, splitted_df), copy=False)
+
+
+def map_unique(series, func):
+    """Apply a vectorized function only on the distinct values of a Pandas Series and map the results back onto
+    the rows, which is much faster for columns with only a few distinct values.
+
+    Args:
+        series (pd.core.series.Series): The series
+        func (function): The function to apply, which takes a series of the distinct values and returns an array of
+            the same length
+
+    Returns:
+        np.ndarray: The results for each row
+    """
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, name=series.name)
+    if (codes < 0).any():
+        # missing values have the code -1, which selects the result of the appended missing value
+        uniques = pd.concat([uniques, pd.Series([np.nan], name=series.name)], ignore_index=True)
+    return np.asarray(func(uniques))[codes]
@@ -28,7 +28,7 @@ setup(
     packages=find_packages(exclude=["tests"]),
     scripts=["bin/network-flow-generator"],
     install_requires=[
-        "numpy==1.18.*",
+        "numpy>=1.18,<1.20",
         "pandas==0.25.*",
         "tensorflow==2.1.*",
         "holoviews==1.12.*",
@@ -36,6 +36,8 @@ setup(
     ],
     extras_require={
         "colorlog":  ["colorlog==4.0.*"],
+        "pyarrow": ["pyarrow>=11.0"],
+        "numba": ["numba>=0.48"],
     },
     include_package_data=True,
     zip_safe=False,